@@ -1,9 +1,40 @@
 import asyncio
+import copy
+import hashlib
+import math
+import os
+import queue
 import threading
 import time
 import uuid
+from collections import OrderedDict
+from concurrent.futures import Future
 from pathlib import Path
-from typing import Any, Dict, List, Tuple
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
+
+# OpenMP/MKL size their thread pools when torch is first imported, so the
+# environment has to be set before that import happens.
+TORCH_NUM_THREADS = int(os.environ.get("TORCH_NUM_THREADS", os.cpu_count() or 1))
+os.environ.setdefault("OMP_NUM_THREADS", str(TORCH_NUM_THREADS))
+os.environ.setdefault("MKL_NUM_THREADS", str(TORCH_NUM_THREADS))
+
+# Upper bound on tiles the inference worker merges from concurrent jobs per forward
+INFERENCE_MAX_BATCH = int(os.environ.get("INFERENCE_MAX_BATCH", "32"))
+# How long the worker lingers for other jobs' batches before running a partial one
+INFERENCE_MAX_WAIT_MS = float(os.environ.get("INFERENCE_MAX_WAIT_MS", "2"))
+
+# Jobs allowed to preprocess/infer at once; later uploads wait their turn in run_job
+MAX_CONCURRENT_JOBS = int(os.environ.get("MAX_CONCURRENT_JOBS", "2"))
+
+# Finished results kept for identical re-uploads; least recently used go first
+RESULT_CACHE_SIZE = int(os.environ.get("RESULT_CACHE_SIZE", "32"))
+
+# Comma-separated MODEL_MAPPING keys (or "all") to load in the background at startup
+PRELOAD_MODELS = [
+    name.strip()
+    for name in os.environ.get("PRELOAD_MODELS", "").split(",")
+    if name.strip()
+]
 
 import numpy as np
 import torch
@@ -20,10 +51,13 @@ from app.models.architectures import (
     ConvNeXtUNet_PlainDecoder,
     SettleNet,
 )
-from app.utils.config import Config, setup_config, get_model_config
+from app.models.optimization import InferenceModel, optimize_for_inference
+from app.utils.config import MODEL_MAPPING, Config, setup_config, get_model_config
 from app.utils.data_processing import (
-    load_and_preprocess_image,
-    combine_predictions_for_web_mapping,
+    archive_data_root,
+    iter_preprocessed_chunks,
+    MaskMosaic,
+    save_mosaic_for_web_mapping,
     create_leaflet_config,
 )
 
@@ -39,17 +73,37 @@ app.add_middleware(
 )
 
 device = torch.device("cpu")
+torch.set_num_threads(TORCH_NUM_THREADS)
 static_dir = Path("app/static")
 static_dir.mkdir(exist_ok=True)
 app.mount("/static", StaticFiles(directory=static_dir), name="static")
 
 
-MODEL_CACHE: Dict[str, torch.nn.Module] = {}
+# model_type -> (prepared model, the Config it was built with)
+MODEL_CACHE: Dict[str, Tuple[InferenceModel, Config]] = {}
 MODEL_CACHE_LOCK = threading.Lock()
 
 PROGRESS_REGISTRY: Dict[str, Dict[str, Any]] = {}
 PROGRESS_REGISTRY_LOCK = threading.Lock()
 
+# "<upload digest>:<model_type>:<threshold>" -> result payload of a finished job
+RESULT_CACHE: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+RESULT_CACHE_LOCK = threading.Lock()
+# Minimum seconds between tile-loop progress updates; the frontend polls slower
+PROGRESS_UPDATE_INTERVAL = 0.25
+
+# (model, batch, logit threshold, future) submitted by jobs to the inference worker
+InferenceRequest = Tuple[InferenceModel, torch.Tensor, float, "Future[np.ndarray]"]
+INFERENCE_QUEUE: "queue.Queue[InferenceRequest]" = queue.Queue()
+INFERENCE_WORKER: Optional[threading.Thread] = None
+# Only touched by the worker thread: one buffer per sample shape, since merged
+# batches are grouped by shape (see inference_loop)
+INPUT_BUFFERS: Dict[Tuple[int, ...], torch.Tensor] = {}
+INFERENCE_WORKER_LOCK = threading.Lock()
+JOB_SLOTS = asyncio.Semaphore(max(1, MAX_CONCURRENT_JOBS))
+# Jobs holding a slot; only changed on the event loop, read by the worker
+ACTIVE_JOBS = 0
+
 
 def initialize_progress(job_id: str) -> None:
     with PROGRESS_REGISTRY_LOCK:
@@ -60,6 +114,7 @@ def initialize_progress(job_id: str) -> None:
             "message": "Queued",
             "tiles_total": 0,
             "tiles_processed": 0,
+            "tiles_skipped": [],
             "result": None,
             "error": None,
         }
@@ -77,70 +132,365 @@ def get_progress(job_id: str) -> Dict[str, Any]:
         return PROGRESS_REGISTRY.get(job_id, {}).copy()
 
 
-def load_model_by_type(model_type: str) -> Tuple[torch.nn.Module, "Config"]:
+def load_state_dict_file(checkpoint_path: Path) -> Dict[str, torch.Tensor]:
+    """Memory-map a .safetensors or torch checkpoint into a state dict."""
+    if checkpoint_path.suffix == ".safetensors":
+        try:
+            from safetensors.torch import load_file
+        except ImportError as exc:  # noqa: BLE001
+            raise RuntimeError(
+                f"Loading {checkpoint_path} requires the 'safetensors' package."
+            ) from exc
+        return load_file(str(checkpoint_path), device=str(device))
+    return torch.load(
+        checkpoint_path, map_location=device, mmap=True, weights_only=True
+    )
+
+
+def build_model(
+    model_name: str, model_file: str, config: Config
+) -> Tuple[InferenceModel, Config]:
+    """Instantiate an architecture, load its checkpoint and prepare it for inference."""
+    model_path = Path("./trained_models") / model_file
+    checkpoint_path = model_path.with_suffix(".safetensors")
+    if not checkpoint_path.exists():
+        checkpoint_path = model_path
+    if not checkpoint_path.exists():
+        raise FileNotFoundError(
+            f"Model file not found at {model_path}. Place it in 'trained_models/'."
+        )
+
+    if model_name == "ConvNeXtUNet":
+        architecture = ConvNeXtUNet
+    elif model_name == "ConvNeXtUNet_PlainDecoder":
+        architecture = ConvNeXtUNet_PlainDecoder
+    elif model_name == "SettleNet":
+        architecture = SettleNet
+    else:
+        raise ValueError(f"Model name '{model_name}' not recognized.")
+
+    # On the meta device no storage is allocated and _init_weights costs nothing;
+    # the checkpoint supplies every parameter and buffer anyway
+    with torch.device("meta"):
+        model = architecture(config)
+
+    # Both loaders mmap the file; assign adopts those tensors without a copy
+    # (strict loading guarantees nothing is left on the meta device)
+    state_dict = load_state_dict_file(checkpoint_path)
+    model.load_state_dict(state_dict, assign=True, strict=True)
+    model.to(device)
+    model.eval()
+    return optimize_for_inference(model, config, checkpoint_path), config
+
+
+def load_model_by_type(model_type: str) -> Tuple[InferenceModel, "Config"]:
     """Load (and cache) a model based on the frontend selection."""
     model_config = get_model_config(model_type)
     modality = model_config["modality"]
     model_name = model_config["model_name"]
     model_file = model_config["model_file"]
 
-    with MODEL_CACHE_LOCK:
-        model = MODEL_CACHE.get(model_type)
-        if model is None:
-            model_path = Path("./trained_models") / model_file
-            if not model_path.exists():
-                raise FileNotFoundError(
-                    f"Model file not found at {model_path}. Place it in 'trained_models/'."
-                )
+    cached = MODEL_CACHE.get(model_type)
+    if cached is None:
+        with MODEL_CACHE_LOCK:
+            cached = MODEL_CACHE.get(model_type)
+            if cached is None:
+                cached = build_model(model_name, model_file, setup_config(modality))
+                MODEL_CACHE[model_type] = cached
+
+    model, cached_config = cached
+    # Jobs repoint DATA_ROOT, so each caller gets its own shallow copy
+    return model, copy.copy(cached_config)
+
+
+def coalesce_into_buffer(batches: List[torch.Tensor]) -> torch.Tensor:
+    """
+    Copy batches into the worker's reusable channels_last input buffer. Every
+    batch must have the same sample shape; inference_loop groups them that way.
+    """
+    total = sum(len(batch) for batch in batches)
+    sample_shape = tuple(batches[0].shape[1:])
+    mismatched = {tuple(batch.shape[1:]) for batch in batches} - {sample_shape}
+    if mismatched:
+        raise ValueError(
+            f"Cannot merge batches of shape {sample_shape} with {sorted(mismatched)}"
+        )
+    buffer = INPUT_BUFFERS.get(sample_shape)
+    if buffer is None or len(buffer) < total:
+        buffer = torch.empty(
+            (max(total, INFERENCE_MAX_BATCH), *sample_shape),
+            memory_format=torch.channels_last,
+        )
+        INPUT_BUFFERS[sample_shape] = buffer
+
+    offset = 0
+    for batch in batches:
+        buffer[offset : offset + len(batch)].copy_(batch)
+        offset += len(batch)
+    return buffer[:total]
 
-            config_for_shape = setup_config(modality)
 
-            if model_name == "ConvNeXtUNet":
-                model = ConvNeXtUNet(config_for_shape)
-            elif model_name == "ConvNeXtUNet_PlainDecoder":
-                model = ConvNeXtUNet_PlainDecoder(config_for_shape)
-            elif model_name == "SettleNet":
-                model = SettleNet(config_for_shape)
-            else:
-                raise ValueError(f"Model name '{model_name}' not recognized.")
+def fail_requests(requests: List[InferenceRequest], exc: BaseException) -> None:
+    """Resolve every still-pending future so no job blocks on predict_masks forever."""
+    for *_, future in requests:
+        if not future.done():
+            future.set_exception(exc)
 
-            state_dict = torch.load(model_path, map_location=device)
-            model.load_state_dict(state_dict)
-            model.to(device)
-            model.eval()
-            MODEL_CACHE[model_type] = model
 
-        cached_model = MODEL_CACHE[model_type]
+def run_coalesced_batch(requests: List[InferenceRequest]) -> None:
+    """
+    One forward pass over requests that share a model and sample shape, split
+    back per request. If a merged pass fails, each request is retried alone so
+    one job's bad batch cannot fail the tiles of the others.
+    """
+    model = requests[0][0]
+    try:
+        if len(requests) == 1:
+            batch = requests[0][1]
+        else:
+            batch = coalesce_into_buffer([request[1] for request in requests])
+        # inference_mode also skips the version-counter/view tracking no_grad keeps
+        with torch.inference_mode():
+            logits = model(batch)
+        # Raises if the model returned a different batch length than it was given
+        request_logits = logits.split([len(request[1]) for request in requests])
+        if len(request_logits) != len(requests):
+            raise ValueError(
+                f"Model returned {len(logits)} results for a batch of {len(batch)}"
+            )
+    except Exception as exc:  # noqa: BLE001
+        if len(requests) > 1:
+            for request in requests:
+                run_coalesced_batch([request])
+        else:
+            fail_requests(requests, exc)
+        return
 
-    # Always create a fresh config so request-specific changes don't leak
-    config = setup_config(modality)
-    return cached_model, config
+    for (_, _, logit_threshold, future), logits_for_request in zip(
+        requests, request_logits
+    ):
+        try:
+            # bool and uint8 share an itemsize, so viewing the comparison is free
+            masks = torch.gt(logits_for_request, logit_threshold).view(torch.uint8)
+            future.set_result(masks.squeeze(1).cpu().numpy())
+        except Exception as exc:  # noqa: BLE001
+            if not future.done():
+                future.set_exception(exc)
+
+
+def inference_loop() -> None:
+    """Run all forward passes on one thread, merging batches from concurrent jobs."""
+    while True:
+        pending = [INFERENCE_QUEUE.get()]
+        try:
+            queued_tiles = len(pending[0][1])
+            # A lone job sends its next batch only after this one returns, so
+            # waiting for more would just delay it; still merge what is queued
+            max_wait_ms = INFERENCE_MAX_WAIT_MS if ACTIVE_JOBS > 1 else 0.0
+            deadline = time.monotonic() + max_wait_ms / 1000.0
+            while queued_tiles < INFERENCE_MAX_BATCH:
+                try:
+                    request = INFERENCE_QUEUE.get(
+                        timeout=max(0.0, deadline - time.monotonic())
+                    )
+                except queue.Empty:
+                    break
+                pending.append(request)
+                queued_tiles += len(request[1])
+
+            # Only batches of the same model and sample shape can share a forward pass
+            groups: Dict[Tuple[int, Tuple[int, ...]], List[InferenceRequest]] = {}
+            for request in pending:
+                if request[3].set_running_or_notify_cancel():
+                    key = (id(request[0]), tuple(request[1].shape[1:]))
+                    groups.setdefault(key, []).append(request)
+            for requests in groups.values():
+                run_coalesced_batch(requests)
+        except Exception as exc:  # noqa: BLE001
+            # Keep the worker alive: fail what was taken off the queue and move on
+            print(f"Inference worker error: {exc}")
+            fail_requests(pending, exc)
+
+
+def start_inference_worker() -> None:
+    global INFERENCE_WORKER
+    with INFERENCE_WORKER_LOCK:
+        if INFERENCE_WORKER is None or not INFERENCE_WORKER.is_alive():
+            INFERENCE_WORKER = threading.Thread(
+                target=inference_loop, name="inference-worker", daemon=True
+            )
+            INFERENCE_WORKER.start()
+
+
+def probability_to_logit(threshold: float) -> float:
+    """sigmoid(x) > t exactly when x > log(t / (1 - t)), so masks skip the exp."""
+    if threshold <= 0.0:
+        return -math.inf
+    if threshold >= 1.0:
+        return math.inf
+    return math.log(threshold / (1.0 - threshold))
+
+
+def predict_masks(
+    model: InferenceModel, batch: torch.Tensor, threshold: float
+) -> np.ndarray:
+    """Queue a batch for the inference worker and block until its masks are ready."""
+    start_inference_worker()
+    future: "Future[np.ndarray]" = Future()
+    INFERENCE_QUEUE.put((model, batch, probability_to_logit(threshold), future))
+    return future.result()
+
+
+def predict_into_mosaic(
+    model: InferenceModel,
+    file_ids: List[str],
+    tensors: List[torch.Tensor],
+    threshold: float,
+    mosaic: MaskMosaic,
+) -> List[str]:
+    """
+    Predicts same-shape tiles as one batch and pastes their masks into the mosaic,
+    returning the ids that made it. A failed batch is retried one tile at a time,
+    so only the tiles that fail on their own are skipped.
+    """
+    try:
+        batch = torch.stack(tensors, 0).to(device, memory_format=torch.channels_last)
+        masks = predict_masks(model, batch, threshold)
+        # Tiles the mosaic has no georeferencing for are not counted as processed
+        return mosaic.write(file_ids, masks)
+    except Exception as exc:  # noqa: BLE001
+        if len(file_ids) == 1:
+            print(f"Error processing tile {file_ids[0]}: {exc}")
+            return []
+
+    processed: List[str] = []
+    for file_id, tensor in zip(file_ids, tensors):
+        processed.extend(
+            predict_into_mosaic(model, [file_id], [tensor], threshold, mosaic)
+        )
+    return processed
+
+
+def preload_models(model_types: List[str]) -> None:
+    for model_type in model_types:
+        try:
+            load_model_by_type(model_type)
+        except Exception as exc:  # noqa: BLE001
+            print(f"Could not preload model '{model_type}': {exc}")
+
+
+@app.on_event("startup")
+async def on_startup() -> None:
+    # Can only be set before the first inter-op parallel work in the process,
+    # which an embedding app (or a reload) may already have done
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError as exc:
+        print(f"Keeping the existing inter-op thread pool: {exc}")
+    start_inference_worker()
+    if PRELOAD_MODELS:
+        model_types = PRELOAD_MODELS
+        if model_types == ["all"]:
+            model_types = list(MODEL_MAPPING)
+        threading.Thread(
+            target=preload_models, args=(model_types,), daemon=True
+        ).start()
 
 
 async def run_job(
-    job_id: str, job_dir: Path, uploaded_path: Path, model_type: str, threshold: float
+    job_id: str,
+    job_dir: Path,
+    uploaded_path: Path,
+    model_type: str,
+    threshold: float,
+    upload_digest: str,
 ) -> None:
+    global ACTIVE_JOBS
     try:
-        await asyncio.to_thread(
-            process_upload_job,
-            job_id,
-            job_dir,
-            uploaded_path,
-            model_type,
-            threshold,
-        )
+        # Each job runs its own preprocessing pool, so cap how many share the CPU
+        async with JOB_SLOTS:
+            ACTIVE_JOBS += 1
+            try:
+                await asyncio.to_thread(
+                    process_upload_job,
+                    job_id,
+                    job_dir,
+                    uploaded_path,
+                    model_type,
+                    threshold,
+                    upload_digest,
+                )
+            finally:
+                ACTIVE_JOBS -= 1
     finally:
         shutil.rmtree(job_dir, ignore_errors=True)
 
 
+def list_archive_tiles(member_names: List[str], dir_name: str) -> List[str]:
+    """File ids of the .tif tiles stored directly under dir_name/ in a ZIP listing."""
+    prefix = f"{dir_name}/"
+    return [
+        name[len(prefix) : -len(".tif")]
+        for name in member_names
+        if name.startswith(prefix)
+        and name.endswith(".tif")
+        and "/" not in name[len(prefix) :]
+    ]
+
+
+def cached_result(cache_key: str) -> Optional[Dict[str, Any]]:
+    """
+    A previous job's payload, marked as cached and without its timings (they
+    describe that run, not this one). Entries whose outputs are gone are dropped.
+    """
+    with RESULT_CACHE_LOCK:
+        payload = RESULT_CACHE.get(cache_key)
+        if payload is None:
+            return None
+        output_file = payload["metadata"]["output_file"]
+        outputs = (output_file, output_file.replace(".tif", ".png"))
+        if not all((static_dir / name).exists() for name in outputs):
+            del RESULT_CACHE[cache_key]
+            return None
+        RESULT_CACHE.move_to_end(cache_key)
+
+    metadata = {
+        key: value
+        for key, value in payload["metadata"].items()
+        if key not in {"pipeline_seconds", "seconds_per_tile"}
+    }
+    return {**payload, "cached": True, "metadata": metadata}
+
+
+def store_result(cache_key: str, payload: Dict[str, Any]) -> None:
+    with RESULT_CACHE_LOCK:
+        RESULT_CACHE[cache_key] = payload
+        RESULT_CACHE.move_to_end(cache_key)
+        while len(RESULT_CACHE) > max(0, RESULT_CACHE_SIZE):
+            RESULT_CACHE.popitem(last=False)
+
+
 def process_upload_job(
     job_id: str,
     job_dir: Path,
     uploaded_path: Path,
     model_type: str,
     threshold: float,
+    upload_digest: str,
 ) -> None:
     try:
+        cache_key = f"{upload_digest}:{model_type}:{threshold}"
+        previous_result = cached_result(cache_key)
+        if previous_result is not None:
+            update_progress(
+                job_id,
+                status="completed",
+                progress=1.0,
+                message="Processing complete (cached result)",
+                result=previous_result,
+            )
+            return
+
         update_progress(
             job_id, status="processing", message="Loading model", progress=0.05
         )
@@ -149,16 +499,12 @@ def process_upload_job(
         if not uploaded_path.name.lower().endswith(".zip"):
             raise ValueError("Only ZIP files are supported")
 
-        extracted_dir = job_dir / "extracted"
-        update_progress(job_id, message="Extracting archive", progress=0.1)
+        update_progress(job_id, message="Reading archive", progress=0.1)
         with zipfile.ZipFile(uploaded_path, "r") as zip_ref:
-            zip_ref.extractall(extracted_dir)
-
-        tile_dirs = {
-            "satellite": extracted_dir / "satellite-256",
-            "bc": extracted_dir / "bc-256",
-            "bh": extracted_dir / "bh-256",
-        }
+            member_names = zip_ref.namelist()
+        # GDAL reads tiles straight out of the ZIP, so nothing is extracted to disk
+        archive_root = archive_data_root(uploaded_path)
+        top_level_dirs = {name.split("/", 1)[0] for name in member_names}
 
         required_dirs: List[str] = []
         if config.MODALITY_TO_RUN in ["satellite", "bc+sat", "all"]:
@@ -168,14 +514,14 @@ def process_upload_job(
         if config.MODALITY_TO_RUN in ["bh", "all"]:
             required_dirs.append("bh")
 
-        missing = [d for d in required_dirs if not tile_dirs[d].exists()]
+        missing = [d for d in required_dirs if f"{d}-256" not in top_level_dirs]
         if missing:
             missing_dirs = ", ".join(f"{name}-256" for name in missing)
             raise ValueError(f"Required directories missing from ZIP: {missing_dirs}")
 
-        available_files: Dict[str, List[Path]] = {}
+        available_files: Dict[str, List[str]] = {}
         for dir_key in required_dirs:
-            files = list(tile_dirs[dir_key].glob("*.tif"))
+            files = list_archive_tiles(member_names, f"{dir_key}-256")
             if not files:
                 raise ValueError(f"No .tif files found in {dir_key}-256 directory")
             available_files[dir_key] = files
@@ -185,16 +531,13 @@ def process_upload_job(
         else:
             reference_key = required_dirs[0]
 
-        file_ids = [f.stem for f in available_files[reference_key]]
+        file_ids = available_files[reference_key]
 
         for dir_key in required_dirs:
             if dir_key == reference_key:
                 continue
-            missing_files = [
-                file_id
-                for file_id in file_ids
-                if not (tile_dirs[dir_key] / f"{file_id}.tif").exists()
-            ]
+            present = set(available_files[dir_key])
+            missing_files = [file_id for file_id in file_ids if file_id not in present]
             if missing_files:
                 raise ValueError(
                     f"Missing tiles in {dir_key}-256 directory: {', '.join(missing_files[:5])}"
@@ -208,30 +551,60 @@ def process_upload_job(
             progress=0.15,
         )
 
-        prediction_masks: List[np.ndarray] = []
+        processed_ids: List[str] = []
         original_data_root = config.DATA_ROOT
-        config.DATA_ROOT = extracted_dir
+        config.DATA_ROOT = archive_root
 
         try:
-            for index, file_id in enumerate(file_ids, start=1):
-                try:
-                    image_tensor, _ = load_and_preprocess_image(file_id, config)
-                    image_tensor = image_tensor.unsqueeze(0).to(device)
-
-                    with torch.no_grad():
-                        logits = model(image_tensor)
-                        pred_mask_np = (
-                            (torch.sigmoid(logits) > threshold)
-                            .squeeze()
-                            .cpu()
-                            .numpy()
-                            .astype(np.uint8)
+            # Batches are pasted into the output raster as they come back
+            mosaic = MaskMosaic(file_ids, config)
+            if mosaic.skipped_ids:
+                update_progress(
+                    job_id,
+                    tiles_skipped=list(mosaic.skipped_ids),
+                    message=(
+                        f"Skipping {len(mosaic.skipped_ids)} tile(s) whose "
+                        "georeferencing could not be read"
+                    ),
+                )
+            index = 0
+            last_progress_update = 0.0
+            pipeline_start = time.perf_counter()
+            for chunk in iter_preprocessed_chunks(
+                file_ids,
+                config,
+                batch_size=max(1, config.BATCH_SIZE),
+                num_workers=config.PREPROCESS_WORKERS,
+            ):
+                # Tiles can only be stacked with others of the same shape
+                by_shape: Dict[Tuple[int, ...], Tuple[List[str], List[torch.Tensor]]] = {}
+                for file_id, pending in chunk:
+                    try:
+                        image_tensor, _ = pending.result()
+                    except Exception as exc:  # noqa: BLE001
+                        print(f"Error processing tile {file_id}: {exc}")
+                        continue
+                    shape_ids, shape_tensors = by_shape.setdefault(
+                        tuple(image_tensor.shape), ([], [])
+                    )
+                    shape_ids.append(file_id)
+                    shape_tensors.append(image_tensor)
+
+                for shape_ids, shape_tensors in by_shape.values():
+                    processed_ids.extend(
+                        predict_into_mosaic(
+                            model, shape_ids, shape_tensors, threshold, mosaic
                         )
-
-                    prediction_masks.append(pred_mask_np)
-                except Exception as exc:  # noqa: BLE001
-                    print(f"Error processing tile {file_id}: {exc}")
-
+                    )
+
+                index += len(chunk)
+                now = time.monotonic()
+                if (
+                    index < total_tiles
+                    and now - last_progress_update < PROGRESS_UPDATE_INTERVAL
+                ):
+                    continue
+                last_progress_update = now
                 progress_value = 0.15 + (0.7 * index / total_tiles)
                 update_progress(
                     job_id,
@@ -240,21 +613,27 @@ def process_upload_job(
                     message=f"Processed {index}/{total_tiles} tiles",
                 )
 
-            if not prediction_masks:
+            if not processed_ids:
                 raise RuntimeError("No tiles were successfully processed")
-
+            processed = set(processed_ids)
+            skipped_ids = [file_id for file_id in file_ids if file_id not in processed]
+            result_message = f"Processed {len(processed_ids)} tiles"
+            if skipped_ids:
+                preview = ", ".join(skipped_ids[:5])
+                more = "..." if len(skipped_ids) > 5 else ""
+                result_message += f"; skipped {len(skipped_ids)}: {preview}{more}"
+
+            # Tile decoding, inference and mask placement; merging/writing the
+            # outputs is deliberately left out
+            pipeline_seconds = time.perf_counter() - pipeline_start
             update_progress(job_id, message="Merging predictions", progress=0.92)
             timestamp = int(time.time())
             output_filename = (
-                f"predictions_{model_type}_{len(prediction_masks)}tiles_{timestamp}.tif"
+                f"predictions_{model_type}_{len(processed_ids)}tiles_{timestamp}.tif"
             )
 
-            web_metadata = combine_predictions_for_web_mapping(
-                prediction_masks=prediction_masks,
-                file_ids=file_ids[: len(prediction_masks)],
-                config=config,
-                output_dir=str(static_dir),
-                filename=output_filename,
+            web_metadata = save_mosaic_for_web_mapping(
+                mosaic, output_dir=str(static_dir), filename=output_filename
             )
 
             png_filename = output_filename.replace(".tif", ".png")
@@ -263,14 +642,20 @@ def process_upload_job(
 
             result_payload = {
                 "success": True,
-                "message": f"Processed {len(prediction_masks)} tiles",
+                "cached": False,
+                "message": result_message,
                 "leaflet_config": leaflet_config,
                 "metadata": {
                     "model_type": model_type,
                     "modality": config.MODALITY_TO_RUN,
                     "threshold": threshold,
-                    "tiles_processed": len(prediction_masks),
+                    "tiles_processed": len(processed_ids),
+                    "tiles_skipped": skipped_ids,
                     "output_file": output_filename,
+                    "pipeline_seconds": round(pipeline_seconds, 3),
+                    "seconds_per_tile": round(
+                        pipeline_seconds / len(processed_ids), 4
+                    ),
                 },
             }
 
@@ -279,8 +664,10 @@ def process_upload_job(
                 status="completed",
                 progress=1.0,
                 message="Processing complete",
+                tiles_skipped=skipped_ids,
                 result=result_payload,
             )
+            store_result(cache_key, result_payload)
         finally:
             config.DATA_ROOT = original_data_root
     except Exception as exc:  # noqa: BLE001
@@ -294,6 +681,17 @@ def process_upload_job(
         )
 
 
+def save_upload(source: BinaryIO, destination: Path) -> str:
+    """Copy the upload to disk in 1 MiB chunks and return its blake2b digest."""
+    # Hashing while copying keys the result cache without a second read
+    digest = hashlib.blake2b(digest_size=16)
+    with open(destination, "wb") as buffer:
+        while chunk := source.read(1 << 20):
+            digest.update(chunk)
+            buffer.write(chunk)
+    return digest.hexdigest()
+
+
 @app.post("/upload")
 async def upload_and_analyze(
     file: UploadFile = File(...),
@@ -329,8 +727,7 @@ async def upload_and_analyze(
     uploaded_path = job_dir / file.filename
 
     try:
-        with open(uploaded_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        upload_digest = await asyncio.to_thread(save_upload, file.file, uploaded_path)
     except Exception as exc:  # noqa: BLE001
         update_progress(
             job_id, status="failed", message=f"Upload failed: {exc}", error=str(exc)
@@ -344,7 +741,9 @@ async def upload_and_analyze(
         job_id, status="processing", message="Queued for processing", progress=0.02
     )
     asyncio.create_task(
-        run_job(job_id, job_dir, uploaded_path, model_type, threshold_value)
+        run_job(
+            job_id, job_dir, uploaded_path, model_type, threshold_value, upload_digest
+        )
     )
 
     return JSONResponse(content={"job_id": job_id})
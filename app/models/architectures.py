@@ -3,11 +3,17 @@
 import torch
 import torch.nn as nn
 from app.utils.config import Config
-from app.models.components import LayerNorm, ConvNeXtBlock, FusionBlock
+from app.models.components import (
+    LayerNorm,
+    ConvNeXtBlock,
+    FusionBlock,
+    SkipProjection,
+    decode_with_skip,
+)
 
 
 class ConvNeXtEncoder(nn.Module):
-    """A standalone ConvNeXt encoder that returns features from each stage."""
+    """A standalone ConvNeXt encoder that returns the (s1, s2, s3, s4) stage features."""
 
     def __init__(self, config: Config, in_chans: int):
         super().__init__()
@@ -15,10 +21,10 @@ class ConvNeXtEncoder(nn.Module):
         self.depths = config.ENCODER_BLOCKS_PER_STAGE
 
         total_blocks = sum(self.depths)
-        dp_rates = [
-            x.item()
-            for x in torch.linspace(0, config.ENCODER_DROP_PATH_RATE, total_blocks)
-        ]
+        # Pinned to CPU so the rates can be read when built under a meta device
+        dp_rates = torch.linspace(
+            0, config.ENCODER_DROP_PATH_RATE, total_blocks, device="cpu"
+        ).tolist()
 
         self.stem = nn.Sequential(
             nn.Conv2d(in_chans, self.dims[0], kernel_size=4, stride=4),
@@ -54,24 +60,12 @@ class ConvNeXtEncoder(nn.Module):
         self.output_channels = self.dims
 
     def forward(self, x):
-        features = {}
-        x = self.stem(x)
-        x = self.stages[0](x)
-        features["s1"] = x
-
-        x = self.downsamplers[0](x)
-        x = self.stages[1](x)
-        features["s2"] = x
-
-        x = self.downsamplers[1](x)
-        x = self.stages[2](x)
-        features["s3"] = x
-
-        x = self.downsamplers[2](x)
-        x = self.stages[3](x)
-        features["s4"] = x
-
-        return features
+        # Plain tuples keep the encoder/decoder boundary traceable in one graph
+        s1 = self.stages[0](self.stem(x))
+        s2 = self.stages[1](self.downsamplers[0](s1))
+        s3 = self.stages[2](self.downsamplers[1](s2))
+        s4 = self.stages[3](self.downsamplers[2](s3))
+        return s1, s2, s3, s4
 
 
 class ConvNeXtDecoder(nn.Module):
@@ -144,18 +138,19 @@ class ConvNeXtDecoder(nn.Module):
         )
         self.final_conv_out = nn.Conv2d(final_ch2, 1, kernel_size=1)
 
-    def forward(self, features: dict):
-        s1, s2, s3, s4 = features["s1"], features["s2"], features["s3"], features["s4"]
+    def fuse(self):
+        """Splits each skip projection's kernel into its x and skip halves once."""
+        for block in (self.dec_block1, self.dec_block2, self.dec_block3):
+            proj = block[0]
+            if isinstance(proj, nn.Conv2d):
+                # The upsampled input and the skip have the same channel count
+                block[0] = SkipProjection(proj, proj.in_channels // 2)
+
+    def forward(self, s1, s2, s3, s4):
         x = self.bottleneck(s4)
-        x = self.up1(x)
-        x = torch.cat([x, s3], dim=1)
-        x = self.dec_block1(x)
-        x = self.up2(x)
-        x = torch.cat([x, s2], dim=1)
-        x = self.dec_block2(x)
-        x = self.up3(x)
-        x = torch.cat([x, s1], dim=1)
-        x = self.dec_block3(x)
+        x = decode_with_skip(self.dec_block1, self.up1(x), s3)
+        x = decode_with_skip(self.dec_block2, self.up2(x), s2)
+        x = decode_with_skip(self.dec_block3, self.up3(x), s1)
         x = self.final_up1(x)
         x = self.final_conv1(x)
         x = self.final_up2(x)
@@ -200,9 +195,7 @@ class UNetDecoder(nn.Module):
         )
         self.final_conv_out = nn.Conv2d(final_channels, 1, kernel_size=1)
 
-    def forward(self, features: dict):
-        s1, s2, s3, s4 = features["s1"], features["s2"], features["s3"], features["s4"]
-
+    def forward(self, s1, s2, s3, s4):
         bottleneck = self.bottleneck(s4)
 
         x = self.up1(bottleneck)
@@ -240,8 +233,7 @@ class ConvNeXtUNet(nn.Module):
                 nn.init.constant_(m.bias, 0)
 
     def forward(self, x):
-        features = self.encoder(x)
-        return self.decoder(features)
+        return self.decoder(*self.encoder(x))
 
 
 class ConvNeXtUNet_PlainDecoder(nn.Module):
@@ -265,8 +257,7 @@ class ConvNeXtUNet_PlainDecoder(nn.Module):
             nn.init.constant_(m.bias, 0)
 
     def forward(self, x):
-        features = self.encoder(x)
-        return self.decoder(features)
+        return self.decoder(*self.encoder(x))
 
 
 class SettleNet(nn.Module):
@@ -325,22 +316,14 @@ class SettleNet(nn.Module):
         feat_bc = self.encoder_bc(x_bc)
         feat_bh = self.encoder_bh(x_bh)
 
-        fused_s1 = self.fusion_blocks[0]([feat_rgb["s1"], feat_bc["s1"], feat_bh["s1"]])
-        fused_s2 = self.fusion_blocks[1]([feat_rgb["s2"], feat_bc["s2"], feat_bh["s2"]])
-        fused_s3 = self.fusion_blocks[2]([feat_rgb["s3"], feat_bc["s3"], feat_bh["s3"]])
+        fused_s1 = self.fusion_blocks[0]([feat_rgb[0], feat_bc[0], feat_bh[0]])
+        fused_s2 = self.fusion_blocks[1]([feat_rgb[1], feat_bc[1], feat_bh[1]])
+        fused_s3 = self.fusion_blocks[2]([feat_rgb[2], feat_bc[2], feat_bh[2]])
 
         # Apply the bridge to create the s4 feature map for the decoder
         bottleneck_s4 = self.bottleneck_bridge(fused_s3)
 
-        # Assemble the dictionary with all 4 feature maps the decoder needs
-        decoder_features = {
-            "s1": fused_s1,
-            "s2": fused_s2,
-            "s3": fused_s3,
-            "s4": bottleneck_s4,
-        }
-
-        return self.decoder(decoder_features)
+        return self.decoder(fused_s1, fused_s2, fused_s3, bottleneck_s4)
 
 
 class ConvNeXtEncoder_3Stage(nn.Module):
@@ -351,10 +334,10 @@ class ConvNeXtEncoder_3Stage(nn.Module):
         dims = config.ENCODER_CHANNEL_LIST[:3]
         depths = config.ENCODER_BLOCKS_PER_STAGE[:3]
         total_blocks = sum(depths)
-        dp_rates = [
-            x.item()
-            for x in torch.linspace(0, config.ENCODER_DROP_PATH_RATE, total_blocks)
-        ]
+        # Pinned to CPU so the rates can be read when built under a meta device
+        dp_rates = torch.linspace(
+            0, config.ENCODER_DROP_PATH_RATE, total_blocks, device="cpu"
+        ).tolist()
         cursor = 0
 
         self.stem = nn.Sequential(
@@ -398,4 +381,4 @@ class ConvNeXtEncoder_3Stage(nn.Module):
         s1 = self.stage0(self.stem(x))
         s2 = self.stage1(self.downsampler1(s1))
         s3 = self.stage2(self.downsampler2(s2))
-        return {"s1": s1, "s2": s2, "s3": s3}
+        return s1, s2, s3
@@ -22,11 +22,15 @@ class LayerNorm(nn.Module):
                 x, self.normalized_shape, self.weight, self.bias, self.eps
             )
         elif self.data_format == "channels_first":
-            u = x.mean(1, keepdim=True)
-            s = (x - u).pow(2).mean(1, keepdim=True)
-            x = (x - u) / torch.sqrt(s + self.eps)
-            x = self.weight[:, None, None] * x + self.bias[:, None, None]
-            return x
+            # On channels_last tensors both permutes are free views, so this is one
+            # fused layer_norm over contiguous channels instead of five elementwise passes
+            return F.layer_norm(
+                x.permute(0, 2, 3, 1),
+                self.normalized_shape,
+                self.weight,
+                self.bias,
+                self.eps,
+            ).permute(0, 3, 1, 2)
 
 
 def drop_path(
@@ -42,6 +46,50 @@ def drop_path(
     return x * random_tensor
 
 
+def project_skip_concat(proj: nn.Conv2d, x, skip):
+    """
+    proj(torch.cat([x, skip], 1)) for a 1x1 conv, computed as the sum of the two
+    halves of its kernel applied separately so the 2C-channel concat is never built.
+    """
+    channels = x.shape[1]
+    return F.conv2d(x, proj.weight[:, :channels], proj.bias) + F.conv2d(
+        skip, proj.weight[:, channels:]
+    )
+
+
+class SkipProjection(nn.Module):
+    """
+    project_skip_concat with the kernel split once into two contiguous halves, so
+    the weights are not sliced (and re-packed by oneDNN) on every forward.
+    """
+
+    def __init__(self, proj: nn.Conv2d, x_channels: int):
+        super().__init__()
+        weight = proj.weight.detach()
+        self.x_weight = nn.Parameter(
+            weight[:, :x_channels].contiguous(), requires_grad=False
+        )
+        self.skip_weight = nn.Parameter(
+            weight[:, x_channels:].contiguous(), requires_grad=False
+        )
+        self.bias = proj.bias
+
+    def forward(self, x, skip):
+        return F.conv2d(x, self.x_weight, self.bias) + F.conv2d(skip, self.skip_weight)
+
+
+def decode_with_skip(block: nn.Sequential, x, skip):
+    """Runs a decoder block whose first layer is a 1x1 projection of cat([x, skip])."""
+    for index, layer in enumerate(block):
+        if index > 0:
+            x = layer(x)
+        elif isinstance(layer, SkipProjection):
+            x = layer(x, skip)
+        else:
+            x = project_skip_concat(layer, x, skip)
+    return x
+
+
 class DropPath(nn.Module):
     def __init__(self, drop_prob=None, scale_by_keep=True):
         super(DropPath, self).__init__()
@@ -71,6 +119,20 @@ class ConvNeXtBlock(nn.Module):
             DropPath(drop_path_rate) if drop_path_rate > 0.0 else nn.Identity()
         )
 
+    @torch.no_grad()
+    def fuse(self):
+        """Folds the layer-scale gamma into pwconv2 so inference skips that multiply."""
+        if self.gamma is None:
+            return
+        scale = self.gamma.reshape(-1)
+        self.pwconv2.weight = nn.Parameter(
+            self.pwconv2.weight * scale[:, None, None, None], requires_grad=False
+        )
+        self.pwconv2.bias = nn.Parameter(
+            self.pwconv2.bias * scale, requires_grad=False
+        )
+        self.gamma = None
+
     def forward(self, x):
         shortcut = x
         x = self.dwconv(x)
@@ -98,9 +160,10 @@ class ChannelAttention(nn.Module):
         self.sigmoid = nn.Sigmoid()
 
     def forward(self, x):
-        return x * self.sigmoid(
-            self.fc(self.avg_pool(x)) + self.fc(self.max_pool(x))
-        ).expand_as(x)
+        # Both pooled descriptors go through the shared MLP as one stacked batch
+        pooled = torch.cat([self.avg_pool(x), self.max_pool(x)], 0)
+        avg_out, max_out = self.fc(pooled).chunk(2, 0)
+        return x * self.sigmoid(avg_out + max_out).expand_as(x)
 
 
 class SpatialAttention(nn.Module):
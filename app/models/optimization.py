@@ -0,0 +1,363 @@
+# app/models/optimization.py
+
+import copy
+import hashlib
+import os
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import torch
+import torch.nn as nn
+from torch.nn.utils.fusion import fuse_conv_bn_eval
+
+from app.models.components import DropPath
+from app.utils.config import Config
+from app.utils.data_processing import load_and_preprocess_image
+
+
+INFERENCE_BACKENDS = (
+    "eager",
+    "torchscript",
+    "compile",
+    "onnx",
+    "onnx-int8",
+    "onnx-int8-static",
+)
+# Backend -> ONNX Runtime quantization mode applied to the exported graph
+ONNX_QUANTIZATION: Dict[str, Optional[str]] = {
+    "onnx": None,
+    "onnx-int8": "dynamic",
+    "onnx-int8-static": "static",
+}
+INFERENCE_PRECISIONS = ("fp32", "bf16")
+
+ONNX_OPSET = 17
+# Bump whenever export or load-time fusion changes the graph for an unchanged
+# checkpoint; it is part of every export's filename (see export_tag)
+ONNX_EXPORT_VERSION = 1
+
+# Anything that maps a (N, C, H, W) batch to (N, 1, H, W) logits
+InferenceModel = Callable[[torch.Tensor], torch.Tensor]
+
+
+def example_input(config: Config, batch_size: int = 1) -> torch.Tensor:
+    """A dummy batch with the shape and memory layout used at inference time."""
+    return torch.randn(
+        batch_size, config.INPUT_CHANNELS, config.TILE_SIZE, config.TILE_SIZE
+    ).contiguous(memory_format=torch.channels_last)
+
+
+@lru_cache(maxsize=1)
+def cpu_supports_bf16() -> bool:
+    """
+    True when this build can run convolutions under CPU BF16 autocast: oneDNN is
+    available and a tiny autocast conv really produces bfloat16.
+    """
+    if not torch.backends.mkldnn.is_available():
+        return False
+    probe = nn.Conv2d(1, 1, kernel_size=1).eval()
+    try:
+        with torch.no_grad(), torch.autocast(device_type="cpu", dtype=torch.bfloat16):
+            output = probe(torch.ones(1, 1, 2, 2))
+    except RuntimeError:
+        return False
+    return output.dtype == torch.bfloat16
+
+
+class AutocastModel(nn.Module):
+    """Runs the wrapped model under CPU autocast and returns FP32 logits."""
+
+    def __init__(self, model: nn.Module, dtype: torch.dtype):
+        super().__init__()
+        self.model = model
+        self.dtype = dtype
+
+    def forward(self, x):
+        with torch.autocast(device_type="cpu", dtype=self.dtype):
+            logits = self.model(x)
+        return logits.float()
+
+
+class OnnxRuntimeModel:
+    """Runs an exported model through an ONNX Runtime CPU session on torch tensors."""
+
+    def __init__(self, onnx_path: Path):
+        try:
+            import onnxruntime as ort
+        except ImportError as exc:  # noqa: BLE001
+            raise RuntimeError(
+                "The ONNX inference backends require the 'onnxruntime' package."
+            ) from exc
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = torch.get_num_threads()
+        self.session = ort.InferenceSession(
+            str(onnx_path), sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, x: torch.Tensor) -> torch.Tensor:
+        batch = np.ascontiguousarray(x.numpy(), dtype=np.float32)
+        (logits,) = self.session.run(None, {self.input_name: batch})
+        return torch.from_numpy(logits)
+
+
+def calibration_tiles(config: Config) -> Tuple[Path, List[str]]:
+    """(root, file ids) of the tiles that calibrate the "onnx-int8-static" backend."""
+    if not config.QUANT_CALIBRATION_ROOT:
+        raise ValueError(
+            "The 'onnx-int8-static' backend needs QUANT_CALIBRATION_ROOT to point at a "
+            "directory of representative *-256/ tiles."
+        )
+    root = Path(config.QUANT_CALIBRATION_ROOT)
+    if config.MODALITY_TO_RUN in {"satellite", "bc+sat", "all"}:
+        reference_dir = root / "satellite-256"
+    else:
+        reference_dir = root / f"{config.MODALITY_TO_RUN}-256"
+    file_ids = (
+        sorted(
+            entry.name[: -len(".tif")]
+            for entry in os.scandir(reference_dir)
+            if entry.name.endswith(".tif")
+        )
+        if reference_dir.is_dir()
+        else []
+    )
+    if not file_ids:
+        raise ValueError(f"No calibration tiles found in {reference_dir}")
+    return root, file_ids[: config.QUANT_CALIBRATION_TILES]
+
+
+class TileCalibrationReader:
+    """Feeds preprocessed tiles from QUANT_CALIBRATION_ROOT to ONNX Runtime's calibrator."""
+
+    def __init__(self, config: Config, input_name: str):
+        self.input_name = input_name
+        # Resolved up front so a bad QUANT_CALIBRATION_ROOT fails here, not mid-run
+        root, file_ids = calibration_tiles(config)
+        self.batches = self._iter_batches(config, root, file_ids)
+
+    @staticmethod
+    def _iter_batches(
+        config: Config, root: Path, file_ids: List[str]
+    ) -> Iterator[np.ndarray]:
+        calibration_config = copy.copy(config)
+        calibration_config.DATA_ROOT = root
+        for file_id in file_ids:
+            tensor, _ = load_and_preprocess_image(
+                file_id, calibration_config, return_viz=False
+            )
+            yield tensor.unsqueeze(0).numpy()
+
+    def get_next(self) -> Optional[Dict[str, np.ndarray]]:
+        batch = next(self.batches, None)
+        return None if batch is None else {self.input_name: batch}
+
+
+def quantize_onnx(
+    onnx_path: Path, int8_path: Path, config: Config, quantization: str
+) -> None:
+    """Writes an INT8 copy of an exported graph using dynamic or calibrated static ranges."""
+    try:
+        from onnxruntime.quantization import (
+            QuantFormat,
+            QuantType,
+            quantize_dynamic,
+            quantize_static,
+        )
+    except ImportError as exc:  # noqa: BLE001
+        raise RuntimeError(
+            f"The '{config.INFERENCE_BACKEND}' backend requires the 'onnxruntime' package."
+        ) from exc
+
+    if quantization == "dynamic":
+        quantize_dynamic(str(onnx_path), str(int8_path), weight_type=QuantType.QInt8)
+        return
+
+    # Only the convolutions get observers; LayerNorm/GELU stay in FP32
+    quantize_static(
+        str(onnx_path),
+        str(int8_path),
+        TileCalibrationReader(config, input_name="input"),
+        quant_format=QuantFormat.QDQ,
+        op_types_to_quantize=["Conv", "ConvTranspose"],
+        per_channel=True,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+    )
+
+
+def write_atomically(path: Path, write: Callable[[Path], None]) -> None:
+    """
+    Runs write() against a temporary sibling of path and renames it into place,
+    so an interrupted or concurrent export never leaves a truncated file behind.
+    """
+    writer = f"{os.getpid()}.{threading.get_ident()}"
+    tmp_path = path.with_name(f".{path.stem}.{writer}.tmp.onnx")
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+def export_tag(config: Config, quantization: Optional[str]) -> str:
+    """
+    Short hash of everything besides the checkpoint that shapes an exported graph,
+    so changing the export code, opset or calibration set never reuses a stale file.
+    """
+    parts = [f"v{ONNX_EXPORT_VERSION}", f"opset{ONNX_OPSET}", quantization or "fp32"]
+    if quantization == "static":
+        root, file_ids = calibration_tiles(config)
+        parts += [str(root.resolve()), *file_ids]
+    return hashlib.blake2b("\0".join(parts).encode(), digest_size=6).hexdigest()
+
+
+def export_onnx(
+    model: nn.Module,
+    config: Config,
+    checkpoint_path: Path,
+    quantization: Optional[str] = None,
+) -> Path:
+    """
+    Exports the model next to its checkpoint (reusing an export with the same
+    export_tag that is newer than the checkpoint) and optionally writes a
+    dynamically or statically quantized copy.
+    """
+    onnx_path = checkpoint_path.with_suffix(f".fp32-{export_tag(config, None)}.onnx")
+    checkpoint_mtime = checkpoint_path.stat().st_mtime
+
+    if not onnx_path.exists() or onnx_path.stat().st_mtime < checkpoint_mtime:
+        write_atomically(
+            onnx_path,
+            lambda path: torch.onnx.export(
+                model,
+                example_input(config).contiguous(),
+                str(path),
+                opset_version=ONNX_OPSET,
+                input_names=["input"],
+                output_names=["logits"],
+                dynamic_axes={"input": {0: "batch"}, "logits": {0: "batch"}},
+            ),
+        )
+
+    if quantization is None:
+        return onnx_path
+
+    int8_path = checkpoint_path.with_suffix(
+        f".{quantization}-{export_tag(config, quantization)}.onnx"
+    )
+    if not int8_path.exists() or int8_path.stat().st_mtime < onnx_path.stat().st_mtime:
+        write_atomically(
+            int8_path,
+            lambda path: quantize_onnx(onnx_path, path, config, quantization),
+        )
+    return int8_path
+
+
+def fold_batch_norms(model: nn.Module) -> None:
+    """Folds each Conv2d -> BatchNorm2d pair inside a Sequential into the conv."""
+    for sequential in model.modules():
+        if not isinstance(sequential, nn.Sequential):
+            continue
+        for index in range(len(sequential) - 1):
+            conv, norm = sequential[index], sequential[index + 1]
+            if isinstance(conv, nn.Conv2d) and isinstance(norm, nn.BatchNorm2d):
+                sequential[index] = fuse_conv_bn_eval(conv, norm)
+                sequential[index + 1] = nn.Identity()
+
+
+def strip_drop_path(model: nn.Module) -> None:
+    """Replaces DropPath (a no-op outside training) with nn.Identity."""
+    for module in model.modules():
+        for name, child in module.named_children():
+            if isinstance(child, DropPath):
+                setattr(module, name, nn.Identity())
+
+
+def fuse_for_inference(model: nn.Module) -> nn.Module:
+    """
+    Folds inference-time constants (valid only in eval mode): drops DropPath,
+    folds BatchNorm statistics into the preceding convs, then runs every
+    submodule's own fuse().
+    """
+    strip_drop_path(model)
+    fold_batch_norms(model)
+    for module in model.modules():
+        fuse = getattr(module, "fuse", None)
+        if callable(fuse):
+            fuse()
+    return model
+
+
+def optimize_for_inference(
+    model: nn.Module, config: Config, checkpoint_path: Path
+) -> InferenceModel:
+    """
+    Prepares an eval-mode model for CPU inference. Submodules first fold
+    their inference-time constants (see fuse_for_inference), then the model is
+    wrapped according to INFERENCE_BACKEND:
+
+    - "eager": the module itself, with weights in channels_last layout
+    - "torchscript": the channels_last module traced and frozen
+    - "compile": the channels_last module compiled by torch.compile (Inductor)
+      and warmed up at BATCH_SIZE so the first job does not pay for compilation
+    - "onnx" / "onnx-int8": an ONNX Runtime session over an exported graph
+    - "onnx-int8-static": the same with convolutions quantized from ranges
+      calibrated on the tiles in QUANT_CALIBRATION_ROOT
+
+    INFERENCE_PRECISION=bf16 additionally runs the eager model under BF16
+    autocast, and raises RuntimeError where BF16 autocast is unavailable.
+    """
+    backend = config.INFERENCE_BACKEND
+    if backend not in INFERENCE_BACKENDS:
+        raise ValueError(
+            f"INFERENCE_BACKEND must be one of {', '.join(INFERENCE_BACKENDS)}; got '{backend}'."
+        )
+    precision = config.INFERENCE_PRECISION
+    if precision not in INFERENCE_PRECISIONS:
+        raise ValueError(
+            f"INFERENCE_PRECISION must be one of {', '.join(INFERENCE_PRECISIONS)}; got '{precision}'."
+        )
+    if precision == "bf16" and backend != "eager":
+        raise ValueError(
+            "INFERENCE_PRECISION=bf16 is only supported with the eager backend."
+        )
+    if precision == "bf16" and not cpu_supports_bf16():
+        # Requested explicitly, so do not quietly serve FP32 instead
+        raise RuntimeError(
+            "INFERENCE_PRECISION=bf16 was requested but this CPU/PyTorch build cannot "
+            "run BF16 autocast; unset it or use INFERENCE_PRECISION=fp32."
+        )
+
+    if backend == "onnx-int8-static":
+        # Fail before the (slow) export rather than once calibration starts
+        calibration_tiles(config)
+
+    model = fuse_for_inference(model)
+
+    if backend in ONNX_QUANTIZATION:
+        onnx_path = export_onnx(
+            model, config, checkpoint_path, quantization=ONNX_QUANTIZATION[backend]
+        )
+        return OnnxRuntimeModel(onnx_path)
+
+    model = model.to(memory_format=torch.channels_last)
+
+    if backend == "torchscript":
+        with torch.no_grad():
+            traced = torch.jit.trace(model, example_input(config))
+        model = torch.jit.freeze(traced)
+    elif backend == "compile":
+        model = torch.compile(model)
+        with torch.inference_mode():
+            model(example_input(config, batch_size=max(1, config.BATCH_SIZE)))
+
+    if precision == "bf16":
+        model = AutocastModel(model, torch.bfloat16).eval()
+
+    return model
@@ -1,7 +1,9 @@
 # app/utils/config.py
 
+import os
 from pathlib import Path
-from dataclasses import dataclass, field
+from dataclasses import dataclass
+from typing import Union
 
 
 # Model mapping configuration
@@ -46,7 +48,8 @@ class Config:
     """
 
     # --- Data Paths (Update these if your structure is different) ---
-    DATA_ROOT: Path = Path("./data/qc")
+    # Jobs point this at a "/vsizip//..." string, which a Path would mangle
+    DATA_ROOT: Union[Path, str] = Path("./data/qc")
 
     # --- Model Selection (These will be overridden in main.py) ---
     MODALITY_TO_RUN: str = "bc+sat"
@@ -54,32 +57,42 @@ class Config:
     # --- Normalization Stats (Must match your training setup) ---
     # NOTE: Since all inputs are now .tif, we assume they are in the 0-255 range.
     # The stats below are from your notebook (scaled from 0-1). We'll handle scaling during loading.
-    RGB_MEAN: list[float] = field(
-        default_factory=lambda: [0.33969313, 0.35239491, 0.28135468]
-    )
-    RGB_STD: list[float] = field(
-        default_factory=lambda: [0.23594516, 0.20353660, 0.20314776]
-    )
-    BC_MEAN: list[float] = field(default_factory=lambda: [0.0009436231339350343])
-    BC_STD: list[float] = field(default_factory=lambda: [0.001719754422083497])
-    BH_MEAN: list[float] = field(default_factory=lambda: [3.086625337600708])
-    BH_STD: list[float] = field(default_factory=lambda: [5.610204696655273])
+    # Tuples are immutable, so every Config shares these instead of copying lists
+    RGB_MEAN: tuple[float, ...] = (0.33969313, 0.35239491, 0.28135468)
+    RGB_STD: tuple[float, ...] = (0.23594516, 0.20353660, 0.20314776)
+    BC_MEAN: tuple[float, ...] = (0.0009436231339350343,)
+    BC_STD: tuple[float, ...] = (0.001719754422083497,)
+    BH_MEAN: tuple[float, ...] = (3.086625337600708,)
+    BH_STD: tuple[float, ...] = (5.610204696655273,)
 
     # --- Model Architecture (Must match the loaded model) ---
-    ENCODER_CHANNEL_LIST: list[int] = field(default_factory=lambda: [80, 160, 320, 640])
-    ENCODER_BLOCKS_PER_STAGE: list[int] = field(default_factory=lambda: [2, 2, 8, 2])
-    DECODER_CONVNEXT_BLOCKS: list[int] = field(default_factory=lambda: [2, 2, 2, 2])
-    FINAL_UPSAMPLING_CHANNELS: list[int] = field(default_factory=lambda: [80, 40, 20])
-    UNET_DECODER_CHANNEL_LIST: list[int] = field(
-        default_factory=lambda: [512, 256, 128, 64]
-    )
+    ENCODER_CHANNEL_LIST: tuple[int, ...] = (80, 160, 320, 640)
+    ENCODER_BLOCKS_PER_STAGE: tuple[int, ...] = (2, 2, 8, 2)
+    DECODER_CONVNEXT_BLOCKS: tuple[int, ...] = (2, 2, 2, 2)
+    FINAL_UPSAMPLING_CHANNELS: tuple[int, ...] = (80, 40, 20)
+    UNET_DECODER_CHANNEL_LIST: tuple[int, ...] = (512, 256, 128, 64)
     ENCODER_DROP_PATH_RATE: float = 0.0
     ENCODER_LAYER_SCALE_INIT_VALUE: float = 1e-6
 
+    # --- Inference Runtime (overridable through the environment) ---
+    TILE_SIZE: int = 256
+    BATCH_SIZE: int = int(os.environ.get("BATCH_SIZE", "16"))
+    PREPROCESS_WORKERS: int = int(
+        os.environ.get("PREPROCESS_WORKERS", str(min(4, os.cpu_count() or 1)))
+    )
+    # One of "eager", "torchscript", "compile", "onnx", "onnx-int8" or
+    # "onnx-int8-static" (see app/models/optimization.py)
+    INFERENCE_BACKEND: str = os.environ.get("INFERENCE_BACKEND", "eager")
+    # "fp32" or "bf16" (autocast, eager backend only; startup fails without BF16 support)
+    INFERENCE_PRECISION: str = os.environ.get("INFERENCE_PRECISION", "fp32")
+    # Representative tiles (same *-256/ layout as an upload) for "onnx-int8-static"
+    QUANT_CALIBRATION_ROOT: str = os.environ.get("QUANT_CALIBRATION_ROOT", "")
+    QUANT_CALIBRATION_TILES: int = int(os.environ.get("QUANT_CALIBRATION_TILES", "64"))
+
     # --- Dynamic Properties (set by setup_config) ---
     INPUT_CHANNELS: int = 0
-    CURRENT_MEAN: list[float] = field(default_factory=list)
-    CURRENT_STD: list[float] = field(default_factory=list)
+    CURRENT_MEAN: tuple[float, ...] = ()
+    CURRENT_STD: tuple[float, ...] = ()
 
 
 def get_model_config(model_type: str) -> dict:
@@ -92,7 +105,7 @@ def get_model_config(model_type: str) -> dict:
     return MODEL_MAPPING[model_type]
 
 
-def setup_config(modality: str) -> Config:
+def _build_config(modality: str) -> Config:
     """Initializes and dynamically updates the configuration based on the chosen modality."""
     config = Config()
     config.MODALITY_TO_RUN = modality
@@ -126,3 +139,18 @@ def setup_config(modality: str) -> Config:
         f"Configuration setup for MODALITY: {config.MODALITY_TO_RUN} ({config.INPUT_CHANNELS} channels)"
     )
     return config
+
+
+# modality -> Config, built on first use
+_CONFIG_CACHE: dict[str, Config] = {}
+
+
+def setup_config(modality: str) -> Config:
+    """
+    Returns the shared Config for a modality. Callers that change fields
+    (e.g. DATA_ROOT for a job) must work on a copy.copy() of it.
+    """
+    config = _CONFIG_CACHE.get(modality)
+    if config is None:
+        config = _CONFIG_CACHE.setdefault(modality, _build_config(modality))
+    return config
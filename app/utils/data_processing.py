@@ -1,70 +1,203 @@
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+import os
 from pathlib import Path
-from typing import Any, Dict, List, Tuple
+from typing import (
+    Any,
+    Deque,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
-import albumentations as A
-from albumentations.pytorch import ToTensorV2
 import numpy as np
 import rasterio
+import rasterio.errors
 from rasterio.coords import BoundingBox
 from rasterio.enums import Resampling
 from rasterio.transform import array_bounds
-from rasterio.warp import calculate_default_transform, reproject
 import torch
 from PIL import Image
 
 from app.utils.config import Config
 
 
+# Working memory (MB) for GDAL's warper; its 64 MB default splits large mosaics
+WARP_MEM_LIMIT_MB = 512
+
+# Every tile is opened at least twice per job (georeferencing, then pixels).
+# Skip GDAL's sibling-file probing (.aux.xml/.ovr/...) on each open, and cache
+# the small header reads it issues against the /vsizip/ archive. Applied with
+# rasterio.Env, which is thread-local, so it is entered in the reading thread.
+ARCHIVE_GDAL_OPTIONS: Dict[str, Any] = {
+    "GDAL_DISABLE_READDIR_ON_OPEN": "EMPTY_DIR",
+    "VSI_CACHE": True,
+}
+
+
+def _minmax_to_uint8(band: np.ndarray) -> np.ndarray:
+    """Stretches a band to 0-255 for previews using a single float temporary."""
+    low, high = band.min(), band.max()
+    scaled = band - low
+    scaled *= 255.0 / (high - low + 1e-6)
+    return scaled.astype(np.uint8)
+
+
+@lru_cache(maxsize=None)
+def _normalization_coefficients(
+    modality: str, mean: Tuple[float, ...], std: Tuple[float, ...]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Per-channel (scale, offset) with raw * scale - offset == (raw / max - mean) / std,
+    where max is 255 for the satellite bands and 1 for bc/bh.
+    """
+    pixel_max = np.ones(len(mean), dtype=np.float64)
+    if modality in {"satellite", "bc+sat", "all"}:
+        pixel_max[:3] = 255.0
+    mean_array = np.asarray(mean, dtype=np.float64)
+    std_array = np.asarray(std, dtype=np.float64)
+    scale = 1.0 / (pixel_max * std_array)
+    offset = mean_array / std_array
+    return (
+        scale.astype(np.float32)[:, None, None],
+        offset.astype(np.float32)[:, None, None],
+    )
+
+
+def archive_data_root(zip_path: Path) -> str:
+    """GDAL path of a ZIP upload's root, for reading its tiles without extracting."""
+    # /vsizip/ is followed by the absolute archive path, so the result starts
+    # "/vsizip//..."; a Path would collapse that into a relative archive path
+    return f"/vsizip/{zip_path.resolve().as_posix()}"
+
+
+def tile_path(data_root: Union[str, Path], dir_name: str, file_id: str) -> str:
+    """Path of a tile under DATA_ROOT, joined as a string so /vsizip/ roots survive."""
+    return f"{str(data_root).rstrip('/')}/{dir_name}/{file_id}.tif"
+
+
 def load_and_preprocess_image(
-    file_id: str, config: Config
+    file_id: str, config: Config, return_viz: bool = True
 ) -> Tuple[torch.Tensor, Dict[str, Image.Image]]:
-    inputs: List[np.ndarray] = []
-    viz_images: Dict[str, Image.Image] = {}
-
+    """
+    Normalised (C, H, W) tensor for a tile plus per-modality preview images.
+    With return_viz=False the previews (a uint8 copy per modality) are skipped
+    and the dict is empty.
+    """
+    # (modality, path, first channel, band count) for each input the model consumes,
+    # in the channel order of CURRENT_MEAN/CURRENT_STD
+    sources: List[Tuple[str, str, int, int]] = []
+    channel = 0
     if config.MODALITY_TO_RUN in {"satellite", "bc+sat", "all"}:
-        path = config.DATA_ROOT / "satellite-256" / f"{file_id}.tif"
-        with rasterio.open(path) as src:
-            rgb = src.read().transpose(1, 2, 0).astype(np.float32) / 255.0
-        inputs.append(rgb)
-        viz_images["satellite"] = Image.fromarray((rgb * 255).astype(np.uint8))
-
+        path = tile_path(config.DATA_ROOT, "satellite-256", file_id)
+        sources.append(("satellite", path, channel, 3))
+        channel += 3
     if config.MODALITY_TO_RUN in {"bc", "bc+sat", "all"}:
-        path = config.DATA_ROOT / "bc-256" / f"{file_id}.tif"
-        with rasterio.open(path) as src:
-            bc = src.read(1).astype(np.float32)
-        inputs.append(bc[..., None])
-        scaled = (bc - bc.min()) / (bc.max() - bc.min() + 1e-6)
-        viz_images["bc"] = Image.fromarray((scaled * 255).astype(np.uint8))
-
+        path = tile_path(config.DATA_ROOT, "bc-256", file_id)
+        sources.append(("bc", path, channel, 1))
+        channel += 1
     if config.MODALITY_TO_RUN in {"bh", "all"}:
-        path = config.DATA_ROOT / "bh-256" / f"{file_id}.tif"
-        with rasterio.open(path) as src:
-            bh = src.read(1).astype(np.float32)
-        inputs.append(bh[..., None])
-        scaled = (bh - bh.min()) / (bh.max() - bh.min() + 1e-6)
-        viz_images["bh"] = Image.fromarray((scaled * 255).astype(np.uint8))
-
-    if not inputs:
+        path = tile_path(config.DATA_ROOT, "bh-256", file_id)
+        sources.append(("bh", path, channel, 1))
+        channel += 1
+
+    if not sources:
         raise ValueError(f"No data loaded for modality {config.MODALITY_TO_RUN}")
 
-    combined = np.concatenate(inputs, axis=-1)
-    transform = A.Compose(
-        transforms=[
-            A.Normalize(
-                mean=tuple(config.CURRENT_MEAN),
-                std=tuple(config.CURRENT_STD),
-                max_pixel_value=1.0,
-            ),
-            ToTensorV2(),
-        ]
+    # Every band is read straight into one CHW float32 buffer: no per-modality
+    # arrays, HWC transposes or concatenation
+    image: Optional[np.ndarray] = None
+    viz_images: Dict[str, Image.Image] = {}
+    for name, path, start, count in sources:
+        with rasterio.Env(**ARCHIVE_GDAL_OPTIONS), rasterio.open(path) as src:
+            if src.count < count:
+                raise ValueError(f"Expected {count} band(s) in {path}, got {src.count}")
+            if image is None:
+                image = np.empty((channel, src.height, src.width), dtype=np.float32)
+            elif src.shape != image.shape[1:]:
+                raise ValueError(
+                    f"{path} is {src.height}x{src.width}, expected {image.shape[1]}x{image.shape[2]}"
+                )
+            bands = image[start : start + count]
+            # GDAL casts to float32 while decoding, straight into the buffer slice
+            src.read(
+                indexes=list(range(1, count + 1)), out=bands, out_dtype=np.float32
+            )
+
+        if not return_viz:
+            continue
+        if name == "satellite":
+            viz_images[name] = Image.fromarray(
+                bands.transpose(1, 2, 0).astype(np.uint8)
+            )
+        else:
+            viz_images[name] = Image.fromarray(_minmax_to_uint8(bands[0]))
+
+    # The 0-255 -> 0-1 rescale of satellite bands is folded into the scale
+    scale, offset = _normalization_coefficients(
+        config.MODALITY_TO_RUN, tuple(config.CURRENT_MEAN), tuple(config.CURRENT_STD)
     )
+    image *= scale
+    image -= offset
+    return torch.from_numpy(image), viz_images
+
 
-    tensor = transform(image=combined)["image"]
-    return tensor, viz_images
+PreprocessedTile = Tuple[torch.Tensor, Dict[str, Image.Image]]
+PendingTile = Tuple[str, "Future[PreprocessedTile]"]
+
+
+def iter_preprocessed_chunks(
+    file_ids: List[str],
+    config: Config,
+    batch_size: int,
+    num_workers: int,
+    prefetch_chunks: int = 2,
+    return_viz: bool = False,
+) -> Iterator[List[PendingTile]]:
+    """
+    Yields file_ids in chunks of batch_size, each paired with a future for its
+    preprocessed tile. Tiles are loaded on a thread pool (rasterio and NumPy
+    release the GIL) while up to prefetch_chunks chunks ahead are kept in
+    flight, so decoding overlaps with inference on the chunk being consumed.
+    Preview images are only built when return_viz is set.
+    """
+    chunks = [
+        file_ids[start : start + batch_size]
+        for start in range(0, len(file_ids), batch_size)
+    ]
+    with ThreadPoolExecutor(max_workers=max(1, num_workers)) as executor:
+
+        def submit(chunk: List[str]) -> List[PendingTile]:
+            return [
+                (
+                    file_id,
+                    executor.submit(
+                        load_and_preprocess_image, file_id, config, return_viz
+                    ),
+                )
+                for file_id in chunk
+            ]
+
+        in_flight: Deque[List[PendingTile]] = deque(
+            submit(chunk) for chunk in chunks[:prefetch_chunks]
+        )
+        next_chunk = len(in_flight)
+        while in_flight:
+            current = in_flight.popleft()
+            if next_chunk < len(chunks):
+                in_flight.append(submit(chunks[next_chunk]))
+                next_chunk += 1
+            yield current
 
 
 def parse_tile_coordinates(file_id: str) -> Tuple[int, int]:
-    parts = file_id.split("_")
+    # Only the first two fields after the prefix matter; leave the rest unsplit
+    parts = file_id.split("_", 3)
     if len(parts) < 3:
         raise ValueError(f"Cannot parse tile coordinates from file_id: {file_id}")
     try:
@@ -75,180 +208,301 @@ def parse_tile_coordinates(file_id: str) -> Tuple[int, int]:
         ) from exc
 
 
-def combine_prediction_masks_geospatially(
-    prediction_masks: List[np.ndarray],
-    file_ids: List[str],
-    output_path: str,
-    config: Config,
-    target_crs: str = "EPSG:3857",
-) -> Dict[str, Any]:
-    if not prediction_masks:
-        raise ValueError("At least one prediction mask is required")
-    if len(prediction_masks) != len(file_ids):
-        raise ValueError("Number of masks must match number of file IDs")
-
-    tile_bounds: List[BoundingBox] = []
-    coords: List[Tuple[int, int]] = []
-    transforms: List[Tuple[rasterio.Affine, object]] = []
-
-    for file_id in file_ids:
-        coord = parse_tile_coordinates(file_id)
-        coords.append(coord)
-        satellite_path = config.DATA_ROOT / "satellite-256" / f"{file_id}.tif"
-        with rasterio.open(satellite_path) as src:
-            transforms.append((src.transform, src.crs))
-            tile_bounds.append(src.bounds)
-
-    min_x = min(c[0] for c in coords)
-    max_x = max(c[0] for c in coords)
-    min_y = min(c[1] for c in coords)
-    max_y = max(c[1] for c in coords)
-
-    grid_width = max_x - min_x + 1
-    grid_height = max_y - min_y + 1
-    tile_size = prediction_masks[0].shape[0]
-
-    output_width = grid_width * tile_size
-    output_height = grid_height * tile_size
-    combined = np.zeros((output_height, output_width), dtype=np.uint8)
-
-    overall_left = min(b.left for b in tile_bounds)
-    overall_bottom = min(b.bottom for b in tile_bounds)
-    overall_right = max(b.right for b in tile_bounds)
-    overall_top = max(b.top for b in tile_bounds)
-
-    pixel_width = (overall_right - overall_left) / output_width
-    pixel_height = (overall_top - overall_bottom) / output_height
-
-    transform = rasterio.Affine(
-        pixel_width,
-        0.0,
-        overall_left,
-        0.0,
-        -pixel_height,
-        overall_top,
-    )
+@lru_cache(maxsize=1)
+def _web_mercator_to_wgs84():
+    """Shared EPSG:3857 -> EPSG:4326 transformer; PROJ setup reads its database."""
+    from pyproj import Transformer
 
-    for mask, bounds in zip(prediction_masks, tile_bounds):
-        raster_x = int(round((bounds.left - overall_left) / pixel_width))
-        raster_y = int(round((overall_top - bounds.top) / pixel_height))
+    return Transformer.from_crs("EPSG:3857", "EPSG:4326", always_xy=True)
 
-        raster_x = max(0, min(raster_x, output_width - tile_size))
-        raster_y = max(0, min(raster_y, output_height - tile_size))
 
-        combined[raster_y : raster_y + tile_size, raster_x : raster_x + tile_size] = (
-            mask.astype(np.uint8)
+def _read_georeferencing(path: str) -> Optional[Tuple[Any, BoundingBox]]:
+    """(crs, bounds) of a tile, or None when it cannot be opened."""
+    try:
+        with rasterio.Env(**ARCHIVE_GDAL_OPTIONS), rasterio.open(path) as src:
+            return src.crs, src.bounds
+    except rasterio.errors.RasterioIOError as exc:
+        # Such tiles fail preprocessing too; MaskMosaic lists them in skipped_ids
+        print(f"Error reading bounds for tile {path}: {exc}")
+        return None
+
+
+class MaskMosaic:
+    """
+    Georeferenced canvas for a job's tiles. Masks are pasted in as soon as they
+    are predicted, so the job never holds a separate per-tile mask array.
+    """
+
+    def __init__(self, file_ids: List[str], config: Config):
+        if not file_ids:
+            raise ValueError("At least one tile is required")
+
+        coords_by_id = {file_id: parse_tile_coordinates(file_id) for file_id in file_ids}
+        satellite_paths = [
+            tile_path(config.DATA_ROOT, "satellite-256", file_id) for file_id in file_ids
+        ]
+        # Header reads are I/O-bound and GDAL drops the GIL, so overlap them
+        with ThreadPoolExecutor(max_workers=max(1, config.PREPROCESS_WORKERS)) as pool:
+            georeferencing = list(pool.map(_read_georeferencing, satellite_paths))
+
+        self.tile_bounds: Dict[str, BoundingBox] = {}
+        # Unreadable tiles are left off the canvas; callers report them to the user
+        self.skipped_ids: List[str] = []
+        coords: List[Tuple[int, int]] = []
+        self.ref_crs = None
+        for file_id, tile_georeferencing in zip(file_ids, georeferencing):
+            if tile_georeferencing is None:
+                self.skipped_ids.append(file_id)
+                continue
+            crs, bounds = tile_georeferencing
+            if self.ref_crs is None:
+                self.ref_crs = crs
+            self.tile_bounds[file_id] = bounds
+            coords.append(coords_by_id[file_id])
+        if not coords:
+            raise ValueError("Could not read georeferencing for any tile")
+
+        grid = np.asarray(coords, dtype=np.int64)
+        self.min_x, self.min_y = (int(value) for value in grid.min(axis=0))
+        self.max_x, self.max_y = (int(value) for value in grid.max(axis=0))
+        self.grid_width = self.max_x - self.min_x + 1
+        self.grid_height = self.max_y - self.min_y + 1
+
+        # BoundingBox is a namedtuple, so rows are (left, bottom, right, top)
+        extents = np.asarray(list(self.tile_bounds.values()), dtype=np.float64)
+        self.overall_left, self.overall_bottom = (
+            float(value) for value in extents[:, :2].min(axis=0)
+        )
+        self.overall_right, self.overall_top = (
+            float(value) for value in extents[:, 2:].max(axis=0)
         )
 
-    ref_crs = transforms[0][1]
-    profile = {
-        "driver": "GTiff",
-        "height": output_height,
-        "width": output_width,
-        "count": 1,
-        "dtype": "uint8",
-        "crs": ref_crs,
-        "transform": transform,
-        "compress": "lzw",
-    }
-
-    if str(ref_crs) != target_crs:
-        try:
-            left, bottom, right, top = array_bounds(
-                output_height, output_width, transform
-            )
-            dst_transform, dst_width, dst_height = calculate_default_transform(
-                ref_crs,
-                target_crs,
-                output_width,
-                output_height,
-                left,
-                bottom,
-                right,
-                top,
-            )
-            if not dst_width or not dst_height:
-                raise ValueError("Invalid destination dimensions")
-            dst_array = np.zeros((int(dst_height), int(dst_width)), dtype=np.uint8)
-            reproject(
-                source=combined,
-                destination=dst_array,
-                src_transform=transform,
-                src_crs=ref_crs,
-                dst_transform=dst_transform,
-                dst_crs=target_crs,
-                resampling=Resampling.nearest,
-            )
-            combined = dst_array
-            profile.update(
-                {
-                    "crs": target_crs,
-                    "transform": dst_transform,
-                    "width": int(dst_width),
-                    "height": int(dst_height),
-                }
-            )
-        except Exception:  # noqa: BLE001
-            target_crs = str(ref_crs)
-
-    with rasterio.open(output_path, "w", **profile) as dst:
-        dst.write(combined, 1)
-
-    png_path = output_path.replace(".tif", ".png")
-    Image.fromarray((combined * 255).astype(np.uint8), mode="L").save(png_path)
-
-    bounds = array_bounds(profile["height"], profile["width"], profile["transform"])
-    leaflet_bounds = bounds
-    if target_crs == "EPSG:3857":
-        try:
-            from pyproj import Transformer
-
-            transformer = Transformer.from_crs("EPSG:3857", "EPSG:4326", always_xy=True)
-            west_lng, south_lat = transformer.transform(bounds[0], bounds[1])
-            east_lng, north_lat = transformer.transform(bounds[2], bounds[3])
-            leaflet_bounds = (west_lng, south_lat, east_lng, north_lat)
-        except Exception:  # noqa: BLE001
-            leaflet_bounds = bounds
-
-    return {
-        "file_path": output_path,
-        "png_path": png_path,
-        "crs": target_crs,
-        "bounds": {
-            "west": leaflet_bounds[0],
-            "south": leaflet_bounds[1],
-            "east": leaflet_bounds[2],
-            "north": leaflet_bounds[3],
-        },
-        "tile_grid": {
-            "min_x": min_x,
-            "max_x": max_x,
-            "min_y": min_y,
-            "max_y": max_y,
-            "width": grid_width,
-            "height": grid_height,
-        },
-        "dimensions": {"width": profile["width"], "height": profile["height"]},
-        "num_tiles": len(prediction_masks),
-    }
+        # Sized from the first mask written, so allocated lazily. Held bit-packed
+        # (8 pixels per byte along each row) until save() needs real pixels.
+        self.packed: Optional[np.ndarray] = None
+        # Ids actually pasted; a retried tile counts once
+        self.written_ids: set[str] = set()
+
+    def _allocate(self, tile_size: int) -> None:
+        self.tile_size = tile_size
+        self.output_width = self.grid_width * tile_size
+        self.output_height = self.grid_height * tile_size
+        self.packed = np.zeros(
+            (self.output_height, (self.output_width + 7) // 8), dtype=np.uint8
+        )
+        self.pixel_width = (self.overall_right - self.overall_left) / self.output_width
+        self.pixel_height = (self.overall_top - self.overall_bottom) / self.output_height
+        self.transform = rasterio.Affine(
+            self.pixel_width,
+            0.0,
+            self.overall_left,
+            0.0,
+            -self.pixel_height,
+            self.overall_top,
+        )
 
+        # Every tile's pixel offset, computed in one vectorised pass
+        file_ids = list(self.tile_bounds)
+        bounds = self.tile_bounds.values()
+        lefts = np.fromiter((b.left for b in bounds), np.float64, len(file_ids))
+        tops = np.fromiter((b.top for b in bounds), np.float64, len(file_ids))
+        raster_xs = np.clip(
+            np.rint((lefts - self.overall_left) / self.pixel_width),
+            0,
+            self.output_width - tile_size,
+        ).astype(np.int64)
+        raster_ys = np.clip(
+            np.rint((self.overall_top - tops) / self.pixel_height),
+            0,
+            self.output_height - tile_size,
+        ).astype(np.int64)
+        self.offsets: Dict[str, Tuple[int, int]] = dict(
+            zip(file_ids, zip(raster_xs.tolist(), raster_ys.tolist()))
+        )
 
-def combine_predictions_for_web_mapping(
-    prediction_masks: List[np.ndarray],
-    file_ids: List[str],
-    config: Config,
-    output_dir: str,
-    filename: str,
+    @property
+    def num_tiles(self) -> int:
+        return len(self.written_ids)
+
+    def write(self, file_ids: Sequence[str], masks: Sequence[np.ndarray]) -> List[str]:
+        """
+        Pastes one (H, W) 0/1 uint8 (or bool) mask per file id into the canvas and
+        returns the ids that were pasted. Tiles whose georeferencing could not be
+        read are not on the canvas and are left out.
+        """
+        if len(masks) != len(file_ids):
+            raise ValueError("Number of masks must match number of file IDs")
+        if isinstance(masks, np.ndarray):
+            # Checked once for the whole (N, H, W) batch rather than per tile
+            if masks.dtype == np.bool_:
+                masks = masks.view(np.uint8)
+            if masks.dtype != np.uint8:
+                raise ValueError(f"Masks must be uint8 or bool, got {masks.dtype}")
+        if len(masks) == 0:
+            return []
+        if self.packed is None:
+            self._allocate(masks[0].shape[0])
+
+        tile_size = self.tile_size
+        written: List[str] = []
+        for file_id, mask in zip(file_ids, masks):
+            offset = self.offsets.get(file_id)
+            if offset is None:
+                continue
+            raster_x, raster_y = offset
+            rows = slice(raster_y, raster_y + tile_size)
+            first_byte = raster_x // 8
+            last_byte = (raster_x + tile_size + 7) // 8
+            if raster_x % 8 == 0 and tile_size % 8 == 0:
+                self.packed[rows, first_byte:last_byte] = np.packbits(mask, axis=1)
+            else:
+                # The tile shares its edge bytes with a neighbour, so merge bitwise
+                span = np.unpackbits(self.packed[rows, first_byte:last_byte], axis=1)
+                start = raster_x - first_byte * 8
+                span[:, start : start + tile_size] = mask
+                self.packed[rows, first_byte:last_byte] = np.packbits(span, axis=1)
+            written.append(file_id)
+        self.written_ids.update(written)
+        return written
+
+    def canvas(self) -> np.ndarray:
+        """The mosaic unpacked to one uint8 0/1 value per pixel."""
+        if self.packed is None:
+            raise ValueError("No masks have been written yet")
+        return np.unpackbits(self.packed, axis=1, count=self.output_width)
+
+    def save(self, output_path: str, target_crs: str = "EPSG:3857") -> Dict[str, Any]:
+        """Reprojects the canvas, writes the GeoTIFF and PNG overlay and returns metadata."""
+        if self.packed is None or self.num_tiles == 0:
+            raise ValueError("At least one prediction mask is required")
+
+        combined = self.canvas()
+        ref_crs = self.ref_crs
+        profile = {
+            "driver": "GTiff",
+            "height": self.output_height,
+            "width": self.output_width,
+            "count": 1,
+            "dtype": "uint8",
+            "crs": ref_crs,
+            "transform": self.transform,
+            # Internally tiled so clients range-read only the blocks they display
+            "tiled": True,
+            "blockxsize": 512,
+            "blockysize": 512,
+            "compress": "deflate",
+            # Masks are 0/1, so GDAL can store them bit-packed
+            "nbits": 1,
+            "bigtiff": "if_needed",
+            "num_threads": "all_cpus",
+        }
+
+        if str(ref_crs) != target_crs:
+            # Only needed when reprojecting; rasterio.warp pulls in the warper bindings
+            from rasterio.warp import calculate_default_transform, reproject
+
+            try:
+                left, bottom, right, top = array_bounds(
+                    self.output_height, self.output_width, self.transform
+                )
+                dst_transform, dst_width, dst_height = calculate_default_transform(
+                    ref_crs,
+                    target_crs,
+                    self.output_width,
+                    self.output_height,
+                    left,
+                    bottom,
+                    right,
+                    top,
+                )
+                if not dst_width or not dst_height:
+                    raise ValueError("Invalid destination dimensions")
+                dst_array = np.zeros((int(dst_height), int(dst_width)), dtype=np.uint8)
+                reproject(
+                    source=combined,
+                    destination=dst_array,
+                    src_transform=self.transform,
+                    src_crs=ref_crs,
+                    dst_transform=dst_transform,
+                    dst_crs=target_crs,
+                    resampling=Resampling.nearest,
+                    # Inference is finished by now, so let GDAL's warper use every core
+                    num_threads=os.cpu_count() or 1,
+                    # Both uint8 canvases usually fit, so the warper needs no chunking
+                    warp_mem_limit=WARP_MEM_LIMIT_MB,
+                )
+                combined = dst_array
+                profile.update(
+                    {
+                        "crs": target_crs,
+                        "transform": dst_transform,
+                        "width": int(dst_width),
+                        "height": int(dst_height),
+                    }
+                )
+            except Exception:  # noqa: BLE001
+                target_crs = str(ref_crs)
+
+        with rasterio.open(output_path, "w", **profile) as dst:
+            dst.write(combined, 1)
+            # Halve down to roughly one block so zoomed-out views read overviews
+            factors = []
+            factor = 2
+            while max(profile["width"], profile["height"]) // factor >= 256:
+                factors.append(factor)
+                factor *= 2
+            if factors:
+                dst.build_overviews(factors, Resampling.nearest)
+                dst.update_tags(ns="rio_overview", resampling="nearest")
+
+        png_path = output_path.replace(".tif", ".png")
+        # Masks only hold 0/1, so a bool view is free and PIL writes it as a 1-bit PNG.
+        # Sparse 1-bit masks gain little from heavier zlib levels, so favour speed.
+        Image.fromarray(combined.view(np.bool_)).save(png_path, compress_level=1)
+
+        bounds = array_bounds(profile["height"], profile["width"], profile["transform"])
+        leaflet_bounds = bounds
+        if target_crs == "EPSG:3857":
+            try:
+                # Both corners go through PROJ in one call
+                (west_lng, east_lng), (south_lat, north_lat) = (
+                    _web_mercator_to_wgs84().transform(
+                        [bounds[0], bounds[2]], [bounds[1], bounds[3]]
+                    )
+                )
+                leaflet_bounds = (west_lng, south_lat, east_lng, north_lat)
+            except Exception:  # noqa: BLE001
+                leaflet_bounds = bounds
+
+        return {
+            "file_path": output_path,
+            "png_path": png_path,
+            "crs": target_crs,
+            "bounds": {
+                "west": leaflet_bounds[0],
+                "south": leaflet_bounds[1],
+                "east": leaflet_bounds[2],
+                "north": leaflet_bounds[3],
+            },
+            "tile_grid": {
+                "min_x": self.min_x,
+                "max_x": self.max_x,
+                "min_y": self.min_y,
+                "max_y": self.max_y,
+                "width": self.grid_width,
+                "height": self.grid_height,
+            },
+            "dimensions": {"width": profile["width"], "height": profile["height"]},
+            "num_tiles": self.num_tiles,
+        }
+
+
+def save_mosaic_for_web_mapping(
+    mosaic: MaskMosaic, output_dir: str, filename: str
 ) -> Dict[str, Any]:
     output_path = Path(output_dir)
     output_path.mkdir(exist_ok=True)
-    full_path = output_path / filename
-    return combine_prediction_masks_geospatially(
-        prediction_masks=prediction_masks,
-        file_ids=file_ids,
-        output_path=str(full_path),
-        config=config,
-    )
+    return mosaic.save(str(output_path / filename))
 
 
 def create_leaflet_config(metadata: Dict[str, Any], tiff_url: str) -> Dict[str, Any]:
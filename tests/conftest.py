@@ -0,0 +1,8 @@
+import os
+import sys
+from pathlib import Path
+
+# The app is run from the repository root (it mounts "app/static" relative to it)
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+os.chdir(REPO_ROOT)
@@ -0,0 +1,79 @@
+import copy
+import zipfile
+
+import pytest
+
+np = pytest.importorskip("numpy")
+rasterio = pytest.importorskip("rasterio")
+pytest.importorskip("torch")
+
+from rasterio.transform import from_origin
+
+from app.utils.config import setup_config
+from app.utils.data_processing import (
+    MaskMosaic,
+    archive_data_root,
+    load_and_preprocess_image,
+)
+
+TILE_SIZE = 32
+FILE_ID = "tile_3_5"
+
+
+@pytest.fixture
+def satellite_upload(tmp_path):
+    """A ZIP laid out like an upload, holding one georeferenced satellite tile."""
+    tile = tmp_path / f"{FILE_ID}.tif"
+    with rasterio.open(
+        tile,
+        "w",
+        driver="GTiff",
+        height=TILE_SIZE,
+        width=TILE_SIZE,
+        count=3,
+        dtype="uint8",
+        crs="EPSG:3857",
+        transform=from_origin(1000.0, 2000.0, 10.0, 10.0),
+    ) as dst:
+        dst.write(np.full((3, TILE_SIZE, TILE_SIZE), 128, dtype=np.uint8))
+
+    upload = tmp_path / "upload.zip"
+    with zipfile.ZipFile(upload, "w") as archive:
+        archive.write(tile, f"satellite-256/{FILE_ID}.tif")
+    return upload
+
+
+def archive_config(upload):
+    config = copy.copy(setup_config("satellite"))
+    config.DATA_ROOT = archive_data_root(upload)
+    return config
+
+
+def test_archive_root_keeps_absolute_zip_path(satellite_upload):
+    root = archive_data_root(satellite_upload)
+    assert root == f"/vsizip/{satellite_upload.resolve().as_posix()}"
+    assert root.startswith("/vsizip//")
+
+
+def test_tiles_are_read_from_zip_upload(satellite_upload):
+    config = archive_config(satellite_upload)
+
+    tensor, _ = load_and_preprocess_image(FILE_ID, config, return_viz=False)
+    assert tuple(tensor.shape) == (3, TILE_SIZE, TILE_SIZE)
+
+    mosaic = MaskMosaic([FILE_ID], config)
+    assert FILE_ID in mosaic.tile_bounds
+    assert (mosaic.min_x, mosaic.min_y) == (3, 5)
+
+
+def test_unreadable_tiles_are_reported_as_skipped(satellite_upload):
+    with zipfile.ZipFile(satellite_upload, "a") as archive:
+        archive.writestr("satellite-256/tile_4_5.tif", b"not a GeoTIFF")
+    config = archive_config(satellite_upload)
+
+    mosaic = MaskMosaic([FILE_ID, "tile_4_5"], config)
+    assert mosaic.skipped_ids == ["tile_4_5"]
+
+    masks = np.ones((2, TILE_SIZE, TILE_SIZE), dtype=np.uint8)
+    assert mosaic.write([FILE_ID, "tile_4_5"], masks) == [FILE_ID]
+    assert mosaic.num_tiles == 1
@@ -0,0 +1,77 @@
+import copy
+import dataclasses
+
+import pytest
+
+torch = pytest.importorskip("torch")
+nn = torch.nn
+
+from app.models.architectures import ConvNeXtUNet, ConvNeXtUNet_PlainDecoder, SettleNet
+from app.models.components import ConvNeXtBlock, DropPath, SkipProjection
+from app.models.optimization import fuse_for_inference
+from app.utils.config import setup_config
+
+
+def small_config(modality):
+    return dataclasses.replace(
+        setup_config(modality),
+        ENCODER_CHANNEL_LIST=(16, 32, 48, 64),
+        ENCODER_BLOCKS_PER_STAGE=(1, 1, 2, 1),
+        DECODER_CONVNEXT_BLOCKS=(1, 1, 1, 1),
+        FINAL_UPSAMPLING_CHANNELS=(16, 12, 8),
+        UNET_DECODER_CHANNEL_LIST=(48, 32, 16, 8),
+        ENCODER_DROP_PATH_RATE=0.1,
+        # Far from the 1e-6 default so a wrong gamma fold shows in the output
+        ENCODER_LAYER_SCALE_INIT_VALUE=0.5,
+    )
+
+
+def randomize_inference_constants(model):
+    """Gives BatchNorm statistics and layer scales values fusion can get wrong."""
+    generator = torch.Generator().manual_seed(0)
+    with torch.no_grad():
+        for module in model.modules():
+            if isinstance(module, nn.BatchNorm2d):
+                shape = module.running_mean.shape
+                module.running_mean.copy_(torch.randn(shape, generator=generator))
+                module.running_var.copy_(torch.rand(shape, generator=generator) + 0.5)
+                module.weight.copy_(torch.randn(shape, generator=generator))
+                module.bias.copy_(torch.randn(shape, generator=generator))
+            elif isinstance(module, ConvNeXtBlock):
+                module.gamma.copy_(
+                    torch.rand(module.gamma.shape, generator=generator) + 0.5
+                )
+
+
+@pytest.mark.parametrize(
+    "model_class, modality",
+    [
+        (ConvNeXtUNet, "satellite"),
+        (ConvNeXtUNet_PlainDecoder, "all"),
+        (SettleNet, "all"),
+    ],
+)
+def test_fused_model_matches_eval_forward(model_class, modality):
+    torch.manual_seed(0)
+    config = small_config(modality)
+    model = model_class(config).double().eval()
+    randomize_inference_constants(model)
+
+    fused = fuse_for_inference(copy.deepcopy(model))
+    assert not any(
+        isinstance(module, (nn.BatchNorm2d, DropPath)) for module in fused.modules()
+    )
+    assert all(
+        module.gamma is None
+        for module in fused.modules()
+        if isinstance(module, ConvNeXtBlock)
+    )
+    if model_class is not ConvNeXtUNet_PlainDecoder:
+        assert any(isinstance(module, SkipProjection) for module in fused.modules())
+
+    x = torch.randn(2, config.INPUT_CHANNELS, 64, 64, dtype=torch.float64)
+    with torch.no_grad():
+        expected = model(x)
+        actual = fused(x)
+    assert actual.shape == expected.shape == (2, 1, 64, 64)
+    assert torch.allclose(actual, expected, rtol=1e-7, atol=1e-9)
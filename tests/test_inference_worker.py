@@ -0,0 +1,101 @@
+from concurrent.futures import Future, wait
+
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("fastapi")
+pytest.importorskip("rasterio")
+
+from app import main
+
+
+def first_channel(batch):
+    """Stands in for a model: (N, C, H, W) -> (N, 1, H, W) logits."""
+    return batch[:, :1]
+
+
+def make_request(model, batch, threshold=0.5):
+    return (model, batch, main.probability_to_logit(threshold), Future())
+
+
+class UnshapedBatch:
+    """Passes the worker's len() check but breaks its grouping step."""
+
+    def __len__(self):
+        return 1
+
+    @property
+    def shape(self):
+        raise RuntimeError("no shape")
+
+
+def test_short_model_output_fails_the_request():
+    request = make_request(lambda batch: batch[:1, :1], torch.ones(2, 1, 4, 4))
+    main.run_coalesced_batch([request])
+    with pytest.raises(Exception):
+        request[3].result(timeout=0)
+
+
+def test_short_merged_output_is_retried_per_request():
+    # Wrong for the merged batch of two, right for each request on its own
+    model = lambda batch: batch[:1, :1]  # noqa: E731
+    requests = [make_request(model, torch.ones(1, 1, 4, 4)) for _ in range(2)]
+    main.run_coalesced_batch(requests)
+    for request in requests:
+        assert request[3].result(timeout=0).shape == (1, 4, 4)
+
+
+def test_worker_survives_a_failing_batch():
+    main.start_inference_worker()
+    bad = (first_channel, UnshapedBatch(), 0.0, Future())
+    good = make_request(first_channel, torch.ones(1, 1, 4, 4))
+    main.INFERENCE_QUEUE.put(bad)
+    main.INFERENCE_QUEUE.put(good)
+
+    # Whether or not they were drained together, neither future is orphaned
+    _, not_done = wait([bad[3], good[3]], timeout=5)
+    assert not not_done
+    with pytest.raises(Exception):
+        bad[3].result(timeout=0)
+
+    assert main.INFERENCE_WORKER.is_alive()
+    masks = main.predict_masks(first_channel, torch.ones(2, 1, 4, 4), 0.5)
+    assert masks.shape == (2, 4, 4)
+    assert masks.all()
+
+
+@pytest.mark.parametrize("threshold", [0.0, 1e-6, 0.5, 0.7, 1 - 1e-6, 1.0])
+def test_logit_threshold_matches_sigmoid(threshold):
+    logits = torch.linspace(-20.0, 20.0, 4001, dtype=torch.float64)
+    expected = torch.sigmoid(logits) > threshold
+
+    logit_threshold = main.probability_to_logit(threshold)
+    assert torch.equal(torch.gt(logits, logit_threshold), expected)
+
+    request = make_request(first_channel, logits.reshape(1, 1, 1, -1), threshold)
+    main.run_coalesced_batch([request])
+    masks = request[3].result(timeout=0)
+    assert masks.dtype.name == "uint8"
+    assert torch.equal(torch.from_numpy(masks).reshape(-1).bool(), expected)
+
+
+def rejects_nan(batch):
+    if torch.isnan(batch).any():
+        raise ValueError("NaN input")
+    return first_channel(batch)
+
+
+def test_failing_request_does_not_fail_its_merged_neighbours():
+    poisoned = torch.ones(1, 1, 4, 4)
+    poisoned[0, 0, 0, 0] = float("nan")
+    requests = [
+        make_request(rejects_nan, torch.ones(2, 1, 4, 4)),
+        make_request(rejects_nan, poisoned),
+        make_request(rejects_nan, torch.ones(1, 1, 4, 4)),
+    ]
+    main.run_coalesced_batch(requests)
+
+    with pytest.raises(ValueError, match="NaN input"):
+        requests[1][3].result(timeout=0)
+    assert requests[0][3].result(timeout=0).shape == (2, 4, 4)
+    assert requests[2][3].result(timeout=0).shape == (1, 4, 4)
@@ -0,0 +1,99 @@
+import copy
+
+import pytest
+
+np = pytest.importorskip("numpy")
+rasterio = pytest.importorskip("rasterio")
+pytest.importorskip("torch")
+
+from rasterio.transform import from_origin
+
+from app.utils.config import setup_config
+from app.utils.data_processing import MaskMosaic
+
+
+def build_mosaic(tmp_path, tile_size, grid_width, grid_height):
+    """A MaskMosaic over a grid of georeferenced tiles written to tmp_path."""
+    tile_dir = tmp_path / "satellite-256"
+    tile_dir.mkdir()
+    file_ids = []
+    for row in range(grid_height):
+        for col in range(grid_width):
+            file_id = f"tile_{col}_{row}"
+            with rasterio.open(
+                tile_dir / f"{file_id}.tif",
+                "w",
+                driver="GTiff",
+                height=tile_size,
+                width=tile_size,
+                count=1,
+                dtype="uint8",
+                crs="EPSG:3857",
+                transform=from_origin(col * tile_size, -row * tile_size, 1.0, 1.0),
+            ) as dst:
+                dst.write(np.zeros((1, tile_size, tile_size), dtype=np.uint8))
+            file_ids.append(file_id)
+
+    config = copy.copy(setup_config("satellite"))
+    config.DATA_ROOT = tmp_path
+    return MaskMosaic(file_ids, config), file_ids
+
+
+def random_masks(count, tile_size, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 2, size=(count, tile_size, tile_size), dtype=np.uint8)
+
+
+def paste_reference(mosaic, writes):
+    """The same writes applied to a plain uint8 canvas."""
+    reference = np.zeros((mosaic.output_height, mosaic.output_width), dtype=np.uint8)
+    size = mosaic.tile_size
+    for file_ids, masks in writes:
+        for file_id, mask in zip(file_ids, masks):
+            x, y = mosaic.offsets[file_id]
+            reference[y : y + size, x : x + size] = mask
+    return reference
+
+
+@pytest.mark.parametrize("tile_size", [16, 12])
+def test_packed_canvas_matches_uint8_reference(tmp_path, tile_size):
+    mosaic, file_ids = build_mosaic(tmp_path, tile_size, grid_width=3, grid_height=2)
+    masks = random_masks(len(file_ids), tile_size)
+
+    # Two batches, so later tiles merge into bytes shared with earlier ones
+    writes = [(file_ids[:2], masks[:2]), (file_ids[2:], masks[2:])]
+    for batch_ids, batch_masks in writes:
+        assert mosaic.write(batch_ids, batch_masks) == batch_ids
+
+    xs = {x for x, _ in mosaic.offsets.values()}
+    if tile_size % 8:
+        assert any(x % 8 for x in xs)
+    np.testing.assert_array_equal(mosaic.canvas(), paste_reference(mosaic, writes))
+
+
+def test_overlapping_unaligned_tiles_match_uint8_reference(tmp_path):
+    tile_size = 12
+    mosaic, file_ids = build_mosaic(tmp_path, tile_size, grid_width=3, grid_height=2)
+    # An empty first write just allocates the canvas and its offsets
+    mosaic.write(file_ids[:1], np.zeros((1, tile_size, tile_size), dtype=np.uint8))
+
+    # Neighbours that overlap each other and straddle byte boundaries
+    overlap_ids = ["tile_0_0", "tile_1_0", "tile_2_0"]
+    mosaic.offsets.update({"tile_0_0": (3, 0), "tile_1_0": (9, 5), "tile_2_0": (20, 12)})
+    writes = [
+        (overlap_ids[:1], random_masks(1, tile_size, seed=2)),
+        (overlap_ids[1:], random_masks(2, tile_size, seed=3)),
+    ]
+    for batch_ids, batch_masks in writes:
+        mosaic.write(batch_ids, batch_masks)
+
+    np.testing.assert_array_equal(mosaic.canvas(), paste_reference(mosaic, writes))
+
+
+def test_bool_masks_are_accepted(tmp_path):
+    mosaic, file_ids = build_mosaic(tmp_path, 8, grid_width=2, grid_height=1)
+    masks = random_masks(2, 8).astype(bool)
+    mosaic.write(file_ids, masks)
+    np.testing.assert_array_equal(
+        mosaic.canvas(), paste_reference(mosaic, [(file_ids, masks.astype(np.uint8))])
+    )